@@ -1,17 +1,32 @@
 print("Starting Flask App...")
 
-from flask import Flask, request, jsonify, session, render_template, redirect, url_for, flash
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from flask import Flask, request, jsonify, session, render_template, redirect, url_for, flash, make_response
+from flask.json.provider import JSONProvider
+from werkzeug.security import check_password_hash
+from werkzeug.http import generate_etag
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+from datetime import datetime, date, timedelta
+from decimal import Decimal
 from dotenv import load_dotenv
+import orjson
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 import logging
 import os
-import uuid
-from functools import wraps
+from secrets import token_hex
+import time
+import random
+from types import MappingProxyType
+from functools import wraps, lru_cache
+from operator import itemgetter
+from collections import defaultdict, OrderedDict
 import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+import threading
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
 
 
 # ---------------------------------------
@@ -20,16 +35,45 @@ from email.mime.text import MIMEText
 if not load_dotenv():
     print("Warning: .env file not found. Using default configurations.")
 
-logging.basicConfig(level=logging.DEBUG)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# Skip the per-record thread/process lookups; the format doesn't use them
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+logging.basicConfig(level=LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 
 # ---------------------------------------
 # Flask App Initialization
 # ---------------------------------------
+def json_default(obj):
+    # DynamoDB returns every number as a Decimal
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class OrjsonProvider(JSONProvider):
+    """Serve jsonify() and request.get_json() through orjson"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = os.environ.get('SECRET_KEY', os.urandom(24))
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=1)
+# Compiled templates are cached; skip the per-render mtime check unless asked for
+app.config['TEMPLATES_AUTO_RELOAD'] = os.environ.get('TEMPLATES_AUTO_RELOAD', 'False').lower() == 'true'
+app.jinja_env.auto_reload = app.config['TEMPLATES_AUTO_RELOAD']
+
+# Dashboard paths per role, so login doesn't walk the URL map on every redirect
+DASHBOARD_URLS = {
+    'doctor': '/doctor_dashboard',
+    'patient': '/patient_dashboard',
+}
 
 # ---------------------------------------
 # App Configuration
@@ -69,20 +113,33 @@ NOTIFICATIONS_TABLE_NAME = os.environ.get('NOTIFICATIONS_TABLE_NAME', 'MedTrackN
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN', 'Medtrack')
 ENABLE_SNS = os.environ.get('ENABLE_SNS', 'False').lower() == 'true'
 
-# Login attempt tracking
-login_attempts = {}
+# Login attempt tracking (see RateLimiter)
+LOGIN_MAX_ATTEMPTS = 5
+LOGIN_LOCKOUT_SECONDS = 15 * 60
+LOGIN_ATTEMPTS_MAX_ENTRIES = 10000
+
+# Argon2id hasher for new passwords; legacy Werkzeug hashes still verify
+password_hasher = PasswordHasher()
+# Verified against for unknown users and users without a password (e.g. created by
+# add_patient) so those failures cost an argon2 check like a wrong password does
+DUMMY_PASSWORD_HASH = password_hasher.hash(os.urandom(16).hex())
 
 
 # ---------------------------------------
 # AWS Resources Initialization
 # ---------------------------------------
 
-# AWS region and environment setup
-AWS_REGION_NAME = os.environ.get('AWS_REGION_NAME', 'ap-south-1')
+# One pooled, keep-alive HTTPS connection set shared by every request
+DYNAMODB_CONFIG = Config(
+    max_pool_connections=64,
+    retries={'max_attempts': 5, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
+
 try:
     # Use local DynamoDB for development if AWS credentials not available
     if os.environ.get('AWS_ACCESS_KEY_ID'):
-        dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION_NAME)
+        dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION_NAME, config=DYNAMODB_CONFIG)
         sns = boto3.client('sns', region_name=AWS_REGION_NAME) if ENABLE_SNS else None
     else:
         # Mock DynamoDB for local development
@@ -91,7 +148,7 @@ try:
         logger.warning("AWS credentials not found. Running in local mode.")
         
 except Exception as e:
-    logger.error(f"Error initializing AWS resources: {e}")
+    logger.error("Error initializing AWS resources: %s", e)
     dynamodb = None
     sns = None
 
@@ -106,30 +163,109 @@ local_db = {
     'patients': {},
     'appointments': [],
     'diagnosis': [],
-    'notifications': []
+    'notifications': [],
+    # Per-doctor indexes so the dashboard never scans the full lists
+    'appointments_by_doctor': defaultdict(list),
+    'appointments_by_doctor_date': defaultdict(list),
+    'prescriptions_by_doctor': defaultdict(list),
+    'video_consultations_by_doctor_date': defaultdict(list),
+    # Reverse indexes holding references to the user dicts themselves
+    'doctor_patients': defaultdict(list),
+    'patient_doctors': defaultdict(list),
 }
 
+# local_db lives in one process, so each gunicorn worker would hold its own
+# copy (an appointment booked through one worker is missing from the others).
+# Appointments stay here even in DynamoDB mode, so warn in either mode.
+local_db_warned = False
+
+@app.before_request
+def warn_local_db_multiprocess():
+    global local_db_warned
+    if not local_db_warned and request.environ.get('wsgi.multiprocess'):
+        local_db_warned = True
+        logger.warning("Running under multiple worker processes, but %s are kept in the in-memory "
+                       "local_db and are not shared between workers. Run a single worker.",
+                       "appointments and doctor/patient links" if dynamodb else "users and appointments")
+
 # ---------------------------------------
 # Database Helper Functions for MedTrack
 # ---------------------------------------
 
-def get_users_table():
-    return dynamodb.Table(os.getenv('USERS_TABLE_NAME')) if dynamodb else None
-
-def get_doctors_table():
-    return dynamodb.Table(os.getenv('DOCTORS_TABLE_NAME')) if dynamodb else None
-
-def get_patients_table():
-    return dynamodb.Table(os.getenv('PATIENTS_TABLE_NAME')) if dynamodb else None
+class Tables:
+    """All MedTrack table handles, built once at import (None in local mode)"""
+    __slots__ = ('users', 'doctors', 'patients', 'appointments', 'diagnosis', 'notifications')
+
+    def __init__(self, resource):
+        names = (USERS_TABLE_NAME, DOCTORS_TABLE_NAME, PATIENTS_TABLE_NAME,
+                 APPOINTMENTS_TABLE_NAME, DIAGNOSIS_TABLE_NAME, NOTIFICATIONS_TABLE_NAME)
+        for attr, name in zip(self.__slots__, names):
+            setattr(self, attr, resource.Table(name) if resource else None)
+
+TABLES = Tables(dynamodb)
+
+def fetch_user(email):
+    """Load one user record from DynamoDB, or local_db in local mode"""
+    if dynamodb:
+        return TABLES.users.get_item(Key={'email': email}).get('Item')
+    return local_db['users'].get(email)
+
+BATCH_GET_MAX_KEYS = 100  # DynamoDB BatchGetItem limit per request
+BATCH_GET_BASE_BACKOFF = 0.05  # seconds before the first UnprocessedKeys retry
+BATCH_GET_MAX_BACKOFF = 2.0
+
+def batch_get_users(emails):
+    """Fetch user records for many emails in as few round-trips as possible"""
+    if not dynamodb:
+        return [local_db['users'][email] for email in emails if email in local_db['users']]
+
+    users = []
+    for start in range(0, len(emails), BATCH_GET_MAX_KEYS):
+        request_items = {
+            USERS_TABLE_NAME: {'Keys': [{'email': email} for email in emails[start:start + BATCH_GET_MAX_KEYS]]}
+        }
+        # Throttled keys come back as UnprocessedKeys and are retried with
+        # exponential backoff and full jitter so we don't hammer a throttled table
+        retries = 0
+        while request_items:
+            if retries:
+                time.sleep(random.uniform(0, min(BATCH_GET_MAX_BACKOFF, BATCH_GET_BASE_BACKOFF * 2 ** retries)))
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            users.extend(response['Responses'].get(USERS_TABLE_NAME, []))
+            request_items = response.get('UnprocessedKeys')
+            retries += 1
+    return users
 
-def get_appointments_table():
-    return dynamodb.Table(os.getenv('APPOINTMENTS_TABLE_NAME')) if dynamodb else None
 
-def get_diagnosis_table():
-    return dynamodb.Table(os.getenv('DIAGNOSIS_TABLE_NAME')) if dynamodb else None
+# ---------------------------------------
+# Password Hashing
+# ---------------------------------------
 
-def get_notifications_table():
-    return dynamodb.Table(os.getenv('NOTIFICATIONS_TABLE_NAME')) if dynamodb else None
+def verify_password_hash(password_hash, password):
+    """Return (matches, needs_rehash) for an argon2 or legacy Werkzeug hash"""
+    if not password_hash.startswith('$argon2'):
+        # Hashes created before the argon2 migration
+        return check_password_hash(password_hash, password), True
+    try:
+        password_hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False, False
+    return True, password_hasher.check_needs_rehash(password_hash)
+
+def update_password_hash(user_data, password):
+    """Re-hash a password with the current argon2 parameters after a successful login"""
+    password_hash = password_hasher.hash(password)
+    if dynamodb:
+        try:
+            TABLES.users.update_item(
+                Key={'email': user_data['email']},
+                UpdateExpression='SET password_hash = :h',
+                ExpressionAttributeValues={':h': password_hash},
+            )
+        except Exception as e:
+            logger.error("Failed to update password hash: %s", e)
+            return
+    user_data['password_hash'] = password_hash
 
 
 # ---------------------------------------
@@ -164,33 +300,98 @@ def login_required(role=None, api=False):
 # ---------------------------------------
 # Utility Functions
 # ---------------------------------------
+
+# Each thread keeps one authenticated SMTP session per (server, port, sender)
+# and reuses it across emails instead of reconnecting for every message
+SMTP_MAX_MESSAGES_PER_CONNECTION = 100
+smtp_cache = threading.local()
+smtp_open_connections = set()
+smtp_open_connections_lock = threading.Lock()
+
+def get_cached_smtp_connections():
+    if not hasattr(smtp_cache, 'connections'):
+        smtp_cache.connections = {}  # (server, port, sender) -> [SMTP, messages sent]
+    return smtp_cache.connections
+
+def get_smtp_connection():
+    key = (SMTP_SERVER, SMTP_PORT, SENDER_EMAIL)
+    cached = get_cached_smtp_connections().get(key)
+    if cached:
+        server, sent = cached
+        if sent < SMTP_MAX_MESSAGES_PER_CONNECTION:
+            try:
+                # RSET both clears the previous envelope and proves the session is alive
+                if server.rset()[0] == 250:
+                    return cached
+            except (smtplib.SMTPException, OSError):
+                pass
+        reset_smtp_connection()
+
+    server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+    server.starttls()
+    server.login(SENDER_EMAIL, SENDER_PASSWORD)
+    cached = get_cached_smtp_connections()[key] = [server, 0]
+    with smtp_open_connections_lock:
+        smtp_open_connections.add(server)
+    return cached
+
+def reset_smtp_connection():
+    cached = get_cached_smtp_connections().pop((SMTP_SERVER, SMTP_PORT, SENDER_EMAIL), None)
+    if not cached:
+        return
+    server = cached[0]
+    with smtp_open_connections_lock:
+        smtp_open_connections.discard(server)
+    try:
+        server.quit()
+    except Exception:
+        server.close()
+
+def smtp_send(msg):
+    cached = get_smtp_connection()
+    server = cached[0]
+    server.send_message(msg)
+    cached[1] += 1
+
+@atexit.register
+def close_smtp_connections():
+    with smtp_open_connections_lock:
+        servers = list(smtp_open_connections)
+        smtp_open_connections.clear()
+    for server in servers:
+        try:
+            server.quit()
+        except Exception:
+            pass
+
 def send_email_notification(to_email, subject, body):
     if not ENABLE_EMAIL or not SENDER_EMAIL:
-        logger.info(f"Email notification would be sent: {subject}")
+        logger.info("Email notification would be sent: %s", subject)
         return True
     
     try:
-        msg = MIMEMultipart()
+        msg = EmailMessage()
         msg['From'] = SENDER_EMAIL
         msg['To'] = to_email
         msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
+        msg.set_content(body)
         
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        server.send_message(msg)
-        server.quit()
+        try:
+            smtp_send(msg)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPSenderRefused):
+            # Stale or throttled session; rebuild it and retry once
+            reset_smtp_connection()
+            smtp_send(msg)
         
-        logger.info(f"Email sent successfully to {to_email}")
+        logger.info("Email sent successfully to %s", to_email)
         return True
     except Exception as e:
-        logger.error(f"Failed to send email: {e}")
+        logger.error("Failed to send email: %s", e)
         return False
 
 def send_sns_notification(message):
     if not ENABLE_SNS or not sns or not SNS_TOPIC_ARN:
-        logger.info(f"SNS notification would be sent: {message}")
+        logger.info("SNS notification would be sent: %s", message)
         return True
     
     try:
@@ -198,13 +399,28 @@ def send_sns_notification(message):
         logger.info("SNS notification sent successfully")
         return True
     except Exception as e:
-        logger.error(f"Failed to send SNS notification: {e}")
+        logger.error("Failed to send SNS notification: %s", e)
         return False
 
+# Notifications from request handlers are sent here so the response never
+# waits on SNS/SMTP; each worker thread keeps its own cached SMTP session
+notify_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='notify')
+
 # ---------------------------------------
 # Authentication Routes
 # ---------------------------------------
 
+@lru_cache(maxsize=None)
+def render_plain_auth_page(template, role):
+    # Only two roles reach here, so this holds at most four pages
+    return render_template(template, role=role)
+
+def render_auth_page(template, role):
+    """Serve the login/signup form, rendering it once per role unless flash messages are pending"""
+    if '_flashes' in session:
+        return render_template(template, role=role)
+    return render_plain_auth_page(template, role)
+
 @app.route('/signup/<role>', methods=['GET', 'POST'])
 def signup(role):
     if role not in ('patient', 'doctor'):
@@ -220,21 +436,14 @@ def signup(role):
             flash('All fields are required.', 'warning')
             return render_template('signup.html', role=role)
 
-        # Check if user already exists
-        if dynamodb:
-            user_table = get_user_table()
-            response = user_table.get_item(Key={'email': email})
-            if 'Item' in response:
-                flash('User already exists.', 'danger')
-                return render_template('signup.html', role=role)
-        else:
-            if email in local_db['users']:
-                flash('User already exists.', 'danger')
-                return render_template('signup.html', role=role)
+        # Check if user already exists (DynamoDB checks atomically on write below)
+        if not dynamodb and email in local_db['users']:
+            flash('User already exists.', 'danger')
+            return render_template('signup.html', role=role)
 
         # Create user
-        user_id = str(uuid.uuid4())
-        hashed_password = generate_password_hash(password)
+        user_id = token_hex(16)
+        hashed_password = password_hasher.hash(password)
         user_data = {
             'user_id': user_id,
             'name': name,
@@ -246,17 +455,62 @@ def signup(role):
         }
 
         if dynamodb:
-            user_table.put_item(Item=user_data)
+            try:
+                TABLES.users.put_item(Item=user_data, ConditionExpression='attribute_not_exists(email)')
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                flash('User already exists.', 'danger')
+                return render_template('signup.html', role=role)
         else:
             local_db['users'][email] = user_data
 
         flash('Signup successful! Please log in.', 'success')
         return redirect(url_for('login', role=role))
 
-    return render_template('signup.html', role=role)
+    return render_auth_page('signup.html', role)
 
 
-login_attempts = {}  # Rate-limiting support
+class RateLimiter:
+    """
+    Counts failures per key on the monotonic clock. Entries expire ttl seconds
+    after their last failure and at most maxsize keys are kept, so the store
+    stays small no matter how many clients hit it.
+    """
+    __slots__ = ('max_attempts', 'ttl', 'maxsize', '_entries', '_lock')
+
+    def __init__(self, max_attempts, ttl, maxsize):
+        self.max_attempts = max_attempts
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (failed count, last failure), oldest first
+        self._lock = threading.Lock()
+
+    def _failed_count(self, key, now):
+        count, last_failure = self._entries.get(key, (0, now))
+        return count if now - last_failure < self.ttl else 0
+
+    def is_blocked(self, key):
+        return self._failed_count(key, time.monotonic()) >= self.max_attempts
+
+    def record_failure(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (self._failed_count(key, now) + 1, now)
+            self._entries.move_to_end(key)
+            # Entries are ordered by last failure, so expired ones sit at the front
+            while self._entries:
+                _, last_failure = next(iter(self._entries.values()))
+                if len(self._entries) <= self.maxsize and now - last_failure < self.ttl:
+                    break
+                self._entries.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+login_limiter = RateLimiter(LOGIN_MAX_ATTEMPTS, LOGIN_LOCKOUT_SECONDS, LOGIN_ATTEMPTS_MAX_ENTRIES)
+
 @app.route('/login/<role>', methods=['GET', 'POST'])
 def login(role):
     if role not in ('patient', 'doctor'):
@@ -273,45 +527,36 @@ def login(role):
 
         # Rate-limiting check
         client_ip = request.remote_addr
-        if client_ip in login_attempts:
-            attempt_data = login_attempts[client_ip]
-            if attempt_data['count'] >= 5:
-                if datetime.now() - attempt_data['last_attempt'] < timedelta(minutes=15):
-                    flash('Too many login attempts. Try again later.', 'danger')
-                    return render_template('login.html', role=role)
-                else:
-                    login_attempts[client_ip] = {'count': 0, 'last_attempt': datetime.now()}
+        if login_limiter.is_blocked(client_ip):
+            flash('Too many login attempts. Try again later.', 'danger')
+            return render_template('login.html', role=role)
 
         # Fetch user data
         user_data = None
         if dynamodb:
-            user_table = get_user_table()
             try:
-                response = user_table.get_item(Key={'email': email})
+                response = TABLES.users.get_item(Key={'email': email})
                 if 'Item' in response:
                     user_data = response['Item']
             except Exception as e:
-                logger.error(f"Error fetching user from DynamoDB: {e}")
+                logger.error("Error fetching user from DynamoDB: %s", e)
         else:
             user_data = local_db['users'].get(email)
 
         # Validate user
-        if not user_data or user_data.get('role') != role:
-            login_attempts.setdefault(client_ip, {'count': 0, 'last_attempt': datetime.now()})
-            login_attempts[client_ip]['count'] += 1
-            login_attempts[client_ip]['last_attempt'] = datetime.now()
-            flash('Invalid email or role.', 'danger')
-            return render_template('login.html', role=role)
-
-        if not check_password_hash(user_data.get('password_hash', ''), password):
-            login_attempts.setdefault(client_ip, {'count': 0, 'last_attempt': datetime.now()})
-            login_attempts[client_ip]['count'] += 1
-            login_attempts[client_ip]['last_attempt'] = datetime.now()
-            flash('Incorrect password.', 'danger')
+        known_user = bool(user_data) and user_data.get('role') == role
+        password_hash = user_data.get('password_hash') if known_user else None
+        password_ok, needs_rehash = verify_password_hash(password_hash or DUMMY_PASSWORD_HASH, password)
+        if not (password_hash and password_ok):
+            login_limiter.record_failure(client_ip)
+            flash('Invalid email or password.', 'danger')
             return render_template('login.html', role=role)
 
         # Reset rate-limiting counter
-        login_attempts.pop(client_ip, None)
+        login_limiter.reset(client_ip)
+
+        if needs_rehash:
+            update_password_hash(user_data, password)
 
         # Set session
 
@@ -322,15 +567,13 @@ def login(role):
         session['role'] = user_data['role']
         session.permanent = True
 
-        logger.info(f"{role.capitalize()} logged in: {email}")
+        logger.info("%s logged in: %s", role.capitalize(), email)
         flash('Login successful!', 'success')
 
         # Redirect to appropriate dashboard
-        print("Redirecting to:", url_for(f"{role}_dashboard"))
-
-        return redirect(url_for(f"{role}_dashboard"))
+        return redirect(DASHBOARD_URLS[role])
 
-    return render_template('login.html', role=role)
+    return render_auth_page('login.html', role)
 
 
 # logout route for API
@@ -344,120 +587,201 @@ def logout():
         # Clear session
         session.clear()
 
-        logger.info(f"User logged out: {user_email}")
+        logger.info("User logged out: %s", user_email)
 
         # Optionally send notification (email or SNS)
         message = f"{user_name} has logged out from MediTrack."
-        send_sns_notification(message)
-        # Optionally: send_email_notification(user_email, "Logout Alert", message)
+        notify_pool.submit(send_sns_notification, message)
+        # Optionally: notify_pool.submit(send_email_notification, user_email, "Logout Alert", message)
 
         return jsonify({'message': 'Logged out successfully'}), 200
 
     except Exception as e:
-        logger.error(f"Logout failed: {e}")
+        logger.error("Logout failed: %s", e)
         return jsonify({'error': 'Logout failed'}), 500
 
 
 # ...existing code...
 
-def get_patient_dashboard_data(user_email):
-    # Fetch patient stats from local_db (or DynamoDB if enabled)
-    user = local_db['users'].get(user_email)
-    # Example stats (replace with real queries as needed)
-    active_medications = user.get('active_medications', 5)
-    upcoming_appointments = [a for a in local_db['appointments'] if a.get('patient') == user_email]
-    prescriptions = user.get('prescriptions', 4)
-    health_score = user.get('health_score', 85)
-    notifications = [
-        {
-            'icon': 'fa-calendar-check',
-            'title': 'Upcoming Appointment',
-            'text': 'You have an appointment tomorrow.',
-            'time': '2 hours ago',
-            'unread': True
-        }
-    ]
-    messages = [
-        {
-            'sender': 'Dr. Smith',
-            'time': 'Yesterday',
-            'preview': 'Your test results are ready.',
-            'unread': True
-        }
-    ]
-    appointments = [
-        a for a in local_db['appointments']
-        if a.get('patient') == user_email
-    ]
+# ---------------------------------------
+# Static Dashboard Content
+# ---------------------------------------
+# Placeholder rows shown on the dashboards, built once at import and shared
+# read-only by every render instead of being rebuilt per request
+
+def frozen_rows(*rows):
+    return tuple(MappingProxyType(row) for row in rows)
+
+PATIENT_NOTIFICATIONS = frozen_rows(
+    {
+        'icon': 'fa-calendar-check',
+        'title': 'Upcoming Appointment',
+        'text': 'You have an appointment tomorrow.',
+        'time': '2 hours ago',
+        'unread': True
+    },
+)
 
-    prescriptions_list = [
+PATIENT_MESSAGES = frozen_rows(
+    {
+        'sender': 'Dr. Smith',
+        'time': 'Yesterday',
+        'preview': 'Your test results are ready.',
+        'unread': True
+    },
+)
+
+PATIENT_PRESCRIPTIONS_LIST = frozen_rows(
     {
         'title': 'Hypertension Treatment',
         'issued_date': '2025-05-15',
         'doctor_name': 'Dr. Smith',
         'status': 'Active',
-        'medications': [
+        'medications': frozen_rows(
             {'name': 'Lisinopril', 'dosage': '10mg once daily'},
             {'name': 'Hydrochlorothiazide', 'dosage': '12.5mg once daily'}
-        ]
+        )
     },
     # ... more prescriptions ...
-    ]
+)
+
+AVAILABLE_DOCTORS = frozen_rows(
+    {'email': 'drsmith@example.com', 'name': 'Dr. Smith'},
+    {'email': 'drjohnson@example.com', 'name': 'Dr. Johnson'},
+    {'email': 'saikiran@gmail.com', 'name': 'Dr. Sai'},
+    # ... more doctors ...
+)
+
+DOCTOR_APPOINTMENT_TYPES = frozen_rows(
+    {'label': 'Follow-ups', 'value': 42},
+    {'label': 'New Patients', 'value': 28},
+    {'label': 'Consultations', 'value': 30}
+)
+
+DOCTOR_MESSAGES = frozen_rows(
+    {
+        'sender': 'John Doe',
+        'time': '10:30 AM',
+        'preview': 'Hello Dr. Johnson, I wanted to ask about my recent blood work results...',
+        'unread': True
+    },
+    {
+        'sender': 'Sarah Johnson',
+        'time': 'Yesterday',
+        'preview': "Thank you for the prescription. I've started the new medication and...",
+        'unread': False
+    },
+    # Add more messages as needed
+)
+
+DOCTOR_NOTIFICATIONS = frozen_rows(
+    {
+        'icon': 'fa-calendar-check',
+        'title': 'Upcoming Appointment',
+        'text': 'You have an appointment with John Doe at 10:00 AM today.',
+        'time': '30 minutes ago',
+        'unread': True
+    },
+    {
+        'icon': 'fa-flask',
+        'title': 'New Lab Results',
+        'text': "Sarah Johnson's blood work results are now available.",
+        'time': '1 hour ago',
+        'unread': True
+    },
+    {
+        'icon': 'fa-pills',
+        'title': 'Prescription Refill Request',
+        'text': 'Robert Williams has requested a refill for Metformin.',
+        'time': '3 hours ago',
+        'unread': False
+    },
+    {
+        'icon': 'fa-envelope',
+        'title': 'New Message',
+        'text': 'You have a new message from John Doe.',
+        'time': '5 hours ago',
+        'unread': True
+    },
+    {
+        'icon': 'fa-user-plus',
+        'title': 'New Patient',
+        'text': 'Emma Thompson has been added to your patient list.',
+        'time': 'Yesterday',
+        'unread': False
+    },
+    {
+        'icon': 'fa-calendar-alt',
+        'title': 'Appointment Rescheduled',
+        'text': 'Michael Brown rescheduled his appointment to July 5.',
+        'time': 'Yesterday',
+        'unread': False
+    }
+)
+
+DEFAULT_SPECIALTIES = (
+    'Diabetes Management',
+    'Thyroid Disorders',
+    'Adrenal Disorders',
+    'Pituitary Disorders',
+    'Metabolic Disorders'
+)
+
+DEFAULT_LANGUAGES = ('English (Native)', 'Spanish (Fluent)', 'French (Basic)')
+
+# Every stored appointment has a 'patient' key, so a C-level getter is safe
+appointment_patient = itemgetter('patient')
+
+
+def get_patient_dashboard_data(user_email):
+    # Fetch patient stats from local_db (or DynamoDB if enabled)
+    user = fetch_user(user_email)
+    # Example stats (replace with real queries as needed)
+    active_medications = user.get('active_medications', 5)
+    # One pass over the appointment list, shared by both dashboard fields
+    appointments = [a for a in local_db['appointments'] if appointment_patient(a) == user_email]
+    upcoming_appointments = appointments
+    prescriptions = user.get('prescriptions', 4)
+    health_score = user.get('health_score', 85)
 
     return {
         'name': user.get('name'),
         'role': user.get('role'),
-        'notifications': notifications,
-        'messages': messages,
+        'notifications': PATIENT_NOTIFICATIONS,
+        'messages': PATIENT_MESSAGES,
         'active_medications': active_medications,
         'upcoming_appointments': len(upcoming_appointments),
         'next_appointment': upcoming_appointments[0] if upcoming_appointments else None,
         'prescriptions': prescriptions,
         'appointments': appointments,
         'health_score': health_score,
-        'prescriptions_list': prescriptions_list,
+        'prescriptions_list': PATIENT_PRESCRIPTIONS_LIST,
     }
 
 def get_doctor_dashboard_data(user_email):
-    user = local_db['users'].get(user_email)
+    user = fetch_user(user_email)
     # Example: get all patients assigned to this doctor
-    patient_emails = list(user.get('patients', []))
-    patients = [local_db['users'][email] for email in patient_emails if email in local_db['users']]
+    if dynamodb:
+        patients = batch_get_users(list(user.get('patients', [])))
+    else:
+        patients = local_db['doctor_patients'].get(user_email, ())
 
-    # Get all appointments for this doctor
-    appointments = [
-        a for a in local_db.get('appointments', [])
-        if a.get('doctor') == user_email
-    ]
+    # Work from the per-doctor indexes; .get() avoids creating empty entries
+    today = date.today()
+    current_week = today.isocalendar()[1]
+    appointments = local_db['appointments_by_doctor'].get(user_email, ())
+    todays_appointments = local_db['appointments_by_doctor_date'].get((user_email, today), ())
+    video_consultations = local_db['video_consultations_by_doctor_date'].get((user_email, today), ())
+    prescriptions = local_db['prescriptions_by_doctor'].get(user_email, ())
 
-    # Example: appointments for today
-    today_str = datetime.now().strftime('%Y-%m-%d')
-    todays_appointments = [
-        a for a in local_db.get('appointments', [])
-        if a.get('doctor') == user_email and a.get('date') == today_str
-    ]
-    # Next appointment (if any)
+    # Next appointment / video consultation (if any)
     next_appointment = todays_appointments[0] if todays_appointments else None
-
-    # Example: video consultations for today
-    video_consultations = [
-        v for v in local_db.get('video_consultations', [])
-        if v.get('doctor') == user_email and v.get('date') == today_str
-    ]
     next_video_consult = video_consultations[0] if video_consultations else None
 
-    # Example: prescriptions issued this week
-    prescriptions_this_week = [
-        p for p in local_db.get('prescriptions', [])
-        if p.get('doctor') == user_email and
-           datetime.strptime(p.get('date'), '%Y-%m-%d').isocalendar()[1] == datetime.now().isocalendar()[1]
-    ]
-
     # Example: notifications and messages count
     notifications_count = user.get('notifications_count', 4)
     messages_count = user.get('messages_count', 7)
 
-    today_str = datetime.now().strftime('%Y-%m-%d')
     todays_appointments_list = [
         {
             'title': a.get('title', 'Consultation'),
@@ -467,43 +791,45 @@ def get_doctor_dashboard_data(user_email):
             'location': a.get('location', 'Office 203'),
             'color': a.get('color', '#3498db')
         }
-        for a in local_db.get('appointments', [])
-        if a.get('doctor') == user_email and a.get('date') == today_str
+        for a in todays_appointments
     ]
 
-    today_str = datetime.now().strftime('%Y-%m-%d')
     video_consultations_list = [
         {
             'patient_name': v.get('patient_name'),
             'patient_avatar': v.get('patient_avatar', 'https://randomuser.me/api/portraits/men/32.jpg'),
             'title': v.get('title', 'Upcoming Call'),
             'status': v.get('status', '10:00 AM Today'),
-            'date': v.get('date', today_str),
+            'date': v.get('date', today),
             'time_range': v.get('time_range', '10:00 AM - 10:30 AM'),
             'reason': v.get('reason', ''),
             'notes': v.get('notes', ''),
         }
-        for v in local_db.get('video_consultations', [])
-        if v.get('doctor') == user_email and v.get('date') == today_str
+        for v in video_consultations
     ]
 
-    prescriptions_list = [
-        {
+    # Single pass over this doctor's prescriptions for both the list and the weekly count
+    prescriptions_this_week = 0
+    prescriptions_list = []
+    for p in prescriptions:
+        issued = p.get('date')
+        if isinstance(issued, str):
+            issued = date.fromisoformat(issued)
+        if issued.isocalendar()[1] == current_week:
+            prescriptions_this_week += 1
+        prescriptions_list.append({
             'title': p.get('diagnosis', 'Prescription'),
             'issued_date': p.get('date', ''),
             'patient_name': local_db['users'].get(p.get('patient'), {}).get('name', p.get('patient')),
             'description': p.get('notes', ''),
             'medications': p.get('medications', []),
             'status': p.get('status', 'Active')
-        }
-        for p in local_db.get('prescriptions', [])
-        if p.get('doctor') == user_email
-    ]
+        })
 
     # For the prescription form (empty by default)
     medications = []
 
-    current_date = datetime.now().strftime('%Y-%m-%d')
+    current_date = today.isoformat()
 
 
     analytics = {
@@ -512,11 +838,7 @@ def get_doctor_dashboard_data(user_email):
         'new': 45,  # Replace with real count
         'avg_daily': 8.5  # Replace with real calculation
     },
-    'appointment_types': [
-        {'label': 'Follow-ups', 'value': 42},
-        {'label': 'New Patients', 'value': 28},
-        {'label': 'Consultations', 'value': 30}
-    ],
+    'appointment_types': DOCTOR_APPOINTMENT_TYPES,
     'patient_satisfaction': 92,  # Example percentage
     'treatment_outcomes': 87     # Example percentage
     }
@@ -529,68 +851,6 @@ def get_doctor_dashboard_data(user_email):
         'digest_frequency': user.get('digest_frequency', 'weekly'),
     }
 
-    messages = [
-    {
-        'sender': 'John Doe',
-        'time': '10:30 AM',
-        'preview': 'Hello Dr. Johnson, I wanted to ask about my recent blood work results...',
-        'unread': True
-    },
-    {
-        'sender': 'Sarah Johnson',
-        'time': 'Yesterday',
-        'preview': "Thank you for the prescription. I've started the new medication and...",
-        'unread': False
-    },
-    # Add more messages as needed
-    ]
-
-    notifications = [
-    {
-        'icon': 'fa-calendar-check',
-        'title': 'Upcoming Appointment',
-        'text': 'You have an appointment with John Doe at 10:00 AM today.',
-        'time': '30 minutes ago',
-        'unread': True
-    },
-    {
-        'icon': 'fa-flask',
-        'title': 'New Lab Results',
-        'text': "Sarah Johnson's blood work results are now available.",
-        'time': '1 hour ago',
-        'unread': True
-    },
-    {
-        'icon': 'fa-pills',
-        'title': 'Prescription Refill Request',
-        'text': 'Robert Williams has requested a refill for Metformin.',
-        'time': '3 hours ago',
-        'unread': False
-    },
-    {
-        'icon': 'fa-envelope',
-        'title': 'New Message',
-        'text': 'You have a new message from John Doe.',
-        'time': '5 hours ago',
-        'unread': True
-    },
-    {
-        'icon': 'fa-user-plus',
-        'title': 'New Patient',
-        'text': 'Emma Thompson has been added to your patient list.',
-        'time': 'Yesterday',
-        'unread': False
-    },
-    {
-        'icon': 'fa-calendar-alt',
-        'title': 'Appointment Rescheduled',
-        'text': 'Michael Brown rescheduled his appointment to July 5.',
-        'time': 'Yesterday',
-        'unread': False
-    }
-    ]
-
-
     return {
         'name': user.get('name'),
         'role': user.get('role'),
@@ -605,14 +865,14 @@ def get_doctor_dashboard_data(user_email):
         'video_consultations': len(video_consultations),
         'next_video_consult': next_video_consult,
         'todays_appointments_list': todays_appointments_list,
-        'prescriptions': len([p for p in local_db.get('prescriptions', []) if p.get('doctor') == user_email]),
-        'prescriptions_issued_this_week': len(prescriptions_this_week),
+        'prescriptions': len(prescriptions),
+        'prescriptions_issued_this_week': prescriptions_this_week,
         'video_consultations_list': video_consultations_list,
         'prescriptions_list': prescriptions_list,
         'medications': medications,
         'analytics': analytics,
         'current_date': current_date,
-        'messages': messages,
+        'messages': DOCTOR_MESSAGES,
         'notifications_count': notifications_count,
         'messages_count': messages_count,
         'avatar_url': user.get('avatar_url', 'https://randomuser.me/api/portraits/women/65.jpg'),
@@ -621,15 +881,9 @@ def get_doctor_dashboard_data(user_email):
         'hospital': user.get('hospital', 'City Medical Center'),
         'experience': user.get('experience', 12),
         'about': user.get('about', 'Dr. ' + user.get('name', '') + ' is a board-certified ' + user.get('specialization', '') + '.'),
-        'specialties': user.get('specialties', [
-            'Diabetes Management',
-            'Thyroid Disorders',
-            'Adrenal Disorders',
-            'Pituitary Disorders',
-            'Metabolic Disorders'
-        ]),
-        'languages': user.get('languages', ['English (Native)', 'Spanish (Fluent)', 'French (Basic)']),
-        'notifications': notifications,
+        'specialties': user.get('specialties', DEFAULT_SPECIALTIES),
+        'languages': user.get('languages', DEFAULT_LANGUAGES),
+        'notifications': DOCTOR_NOTIFICATIONS,
         'video_call_patient_name': 'John Doe',  # Or set dynamically based on context
 
     }
@@ -640,13 +894,7 @@ def get_doctor_dashboard_data(user_email):
 def patient_dashboard():
     user_email = session['user']
     dashboard_data = get_patient_dashboard_data(user_email)
-    doctors = [
-        {'email': 'drsmith@example.com', 'name': 'Dr. Smith'},
-        {'email': 'drjohnson@example.com', 'name': 'Dr. Johnson'},
-        {'email': 'saikiran@gmail.com', 'name': 'Dr. Sai'},
-        # ... more doctors ...
-    ]
-    return render_template('patient_dashboard.html', **dashboard_data, doctors=doctors)
+    return render_template('patient_dashboard.html', **dashboard_data, doctors=AVAILABLE_DOCTORS)
 
 @app.route('/doctor_dashboard')
 @login_required(role='doctor')
@@ -664,16 +912,21 @@ def doctor_dashboard():
 def book_appointment():
     if request.method == 'POST':
         doctor_email = request.form['doctor']
-        date = request.form['date']
+        # Dates are stored parsed so the dashboards never re-parse them
+        try:
+            appointment_date = date.fromisoformat(request.form['date'])
+        except ValueError:
+            flash('Invalid appointment date.', 'danger')
+            return render_template('book_appointment.html', user_name=session['name'])
         time = request.form['time']
         title = request.form.get('title', 'Consultation')
         location = request.form.get('location', 'Office 203')
         color = request.form.get('color', '#3498db')
 
-        # Get doctor and patient names from local_db
-        doctor_name = local_db['users'].get(doctor_email, {}).get('name', 'Doctor')
+        # Get doctor and patient names from the users table (or local_db)
+        doctor_name = (fetch_user(doctor_email) or {}).get('name', 'Doctor')
         patient_email = session['user']
-        patient_name = local_db['users'].get(patient_email, {}).get('name', 'Patient')
+        patient_name = session.get('name', 'Patient')
 
         appointment = {
             'patient': patient_email,
@@ -681,12 +934,14 @@ def book_appointment():
             'doctor': doctor_email,
             'doctor_name': doctor_name,
             'title': title,
-            'date': date,
+            'date': appointment_date,
             'time': time,
             'location': location,
             'color': color
         }
         local_db['appointments'].append(appointment)
+        local_db['appointments_by_doctor'][doctor_email].append(appointment)
+        local_db['appointments_by_doctor_date'][(doctor_email, appointment_date)].append(appointment)
         flash('Appointment booked successfully!', 'success')
         return redirect(url_for('patient_dashboard'))
     return render_template('book_appointment.html', user_name=session['name'])
@@ -700,44 +955,76 @@ def add_patient():
     patient_email = request.form['patient_email']
     patient_name = request.form['patient_name']
 
-    # Add patient to doctor's patient list
-    doctor = local_db['users'].get(doctor_email)
-    if doctor:
-        doctor.setdefault('patients', set()).add(patient_email)
+    if dynamodb:
+        # Optionally create a new patient record if not exists, so the
+        # dashboard's batch-get finds every patient the doctor added
+        try:
+            TABLES.users.put_item(
+                Item={'name': patient_name, 'email': patient_email, 'role': 'patient', 'doctors': {doctor_email}},
+                ConditionExpression='attribute_not_exists(email)'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            TABLES.users.update_item(
+                Key={'email': patient_email},
+                UpdateExpression='ADD doctors :d',
+                ExpressionAttributeValues={':d': {doctor_email}}
+            )
+        # Add patient to doctor's patient list; the dashboard batch-gets these emails
+        TABLES.users.update_item(
+            Key={'email': doctor_email},
+            UpdateExpression='ADD patients :p',
+            ExpressionAttributeValues={':p': {patient_email}}
+        )
+        flash('Patient added successfully!', 'success')
+        return redirect(url_for('doctor_dashboard'))
 
-    # Optionally, add doctor to patient's record
     patient = local_db['users'].get(patient_email)
-    if patient:
-        patient.setdefault('doctors', set()).add(doctor_email)
-    else:
+    if not patient:
         # Optionally create a new patient record if not exists
-        local_db['users'][patient_email] = {
+        patient = local_db['users'][patient_email] = {
             'name': patient_name,
             'email': patient_email,
             'role': 'patient',
-            'doctors': {doctor_email}
         }
+    patient_doctors = patient.setdefault('doctors', set())
+    if doctor_email not in patient_doctors:
+        patient_doctors.add(doctor_email)
+        # Add patient to doctor's patient list
+        doctor = local_db['users'].get(doctor_email)
+        if doctor:
+            doctor.setdefault('patients', set()).add(patient_email)
+            local_db['doctor_patients'][doctor_email].append(patient)
+            local_db['patient_doctors'][patient_email].append(doctor)
 
     flash('Patient added successfully!', 'success')
     return redirect(url_for('doctor_dashboard'))
 
 
 
-dynamodb = False  # Simulate DynamoDB off (toggle for actual integration)
-
-def get_user_table():
-    # Placeholder for actual DynamoDB logic
-    return None
+@lru_cache(maxsize=None)
+def render_index():
+    # The landing page has no per-request input, so render and tag it once
+    html = render_template('index.html')
+    return html, generate_etag(html.encode())
 
 # Route: Select role
 @app.route('/')
 def index():
-    return render_template('index.html')
+    html, etag = render_index()
+    response = make_response(html)
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 
 
 
 
+# Appointments and the doctor/patient indexes live in the per-process local_db
+# in both modes (users too without AWS credentials), so run a single worker
+# until they move to DynamoDB: gunicorn -w 1 app:app
 if __name__ == '__main__':
     app.run(debug=True)
@@ -1,13 +1,33 @@
-from flask import Flask, request, jsonify, session, render_template, redirect, url_for, flash
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, request, jsonify, session, render_template, redirect, url_for, flash, make_response
+from flask.json.provider import JSONProvider
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
 from datetime import datetime, timedelta
+from typing import Optional
+from decimal import Decimal
 from dotenv import load_dotenv
+import orjson
+import msgspec
 import boto3
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.config import Config
 import logging
 import os
+import sys
 import uuid
-from functools import wraps
+import time
+import hashlib
+from functools import wraps, lru_cache
+from collections import defaultdict
+from itertools import islice
+from operator import itemgetter
+from sortedcontainers import SortedKeyList
+from concurrent.futures import ThreadPoolExecutor
 import smtplib
+import threading
+import atexit
+import queue
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
@@ -24,7 +44,22 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------
 # Flask App Initialization
 # ---------------------------------------
+def json_default(obj):
+    # DynamoDB returns every number as a Decimal
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class OrjsonProvider(JSONProvider):
+    """Serve jsonify() and request.get_json() through orjson"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = os.environ.get('SECRET_KEY', os.urandom(24))
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=1)
 
@@ -46,20 +81,71 @@ ACTIVITIES_TABLE_NAME = os.environ.get('ACTIVITIES_TABLE_NAME', 'UserActivities'
 HEALTH_METRICS_TABLE_NAME = os.environ.get('HEALTH_METRICS_TABLE_NAME', 'HealthMetrics')
 GOALS_TABLE_NAME = os.environ.get('GOALS_TABLE_NAME', 'WellnessGoals')
 
+# DynamoDB Global Secondary Indexes
+# ActivitiesTable / HealthMetricsTable: hash=user_id, range=timestamp
+# GoalsTable: hash=user_id, range=status
+# UsersTable: hash=user_id (resolves the session's user_id to the email key)
+USER_TIMESTAMP_INDEX = 'user_id-timestamp-index'
+USER_STATUS_INDEX = 'user_id-status-index'
+USER_ID_INDEX = 'user_id-index'
+
 # SNS Configuration
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN')
 ENABLE_SNS = os.environ.get('ENABLE_SNS', 'False').lower() == 'true'
 
-# Login attempt tracking
-login_attempts = {}
+# Login rate limiting (shared across workers through Redis when REDIS_URL is set)
+REDIS_URL = os.environ.get('REDIS_URL')
+# Fixed hourly windows: a generous per-IP quota for mistyped passwords plus a
+# slower per-account quota so rotating IPs can't brute-force a single email
+LOGIN_WINDOW_SECONDS = 60 * 60
+MAX_LOGIN_ATTEMPTS_PER_IP = 30
+MAX_LOGIN_ATTEMPTS_PER_EMAIL = 10
+
+# Dashboard fetches are independent round-trips, so they run concurrently
+DASHBOARD_FETCH_TIMEOUT = float(os.environ.get('DASHBOARD_FETCH_TIMEOUT', 5))
+dashboard_pool = ThreadPoolExecutor(max_workers=8)
+
+# Password hashing is CPU-bound, so it runs on its own pool off the request thread
+password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=2)
+cpu_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+# Hash formats we can verify; anything else is rejected before touching cpu_pool
+PASSWORD_HASH_PREFIXES = ('$argon2', 'pbkdf2:', 'scrypt:')
+
+# Under `gunicorn -k gevent` threads are monkey-patched into greenlets, so
+# CPU-bound work has to go to gevent's native threadpool to keep the hub free
+try:
+    from gevent import get_hub
+    from gevent.monkey import is_module_patched
+    GEVENT_PATCHED = is_module_patched('threading')
+except ImportError:
+    GEVENT_PATCHED = False
+
+# Largest batch accepted by the bulk import endpoints
+MAX_BULK_ITEMS = int(os.environ.get('MAX_BULK_ITEMS', 100))
+
+# DynamoDB Accelerator cluster for read-heavy GET endpoints (optional)
+DAX_ENDPOINT = os.environ.get('DAX_ENDPOINT')
+
+# Open DynamoDB connections at startup instead of on the first request
+WARMUP_CONNECTIONS = os.environ.get('WARMUP_CONNECTIONS', 'True').lower() == 'true'
 
 # ---------------------------------------
 # AWS Resources Initialization
 # ---------------------------------------
+# One pooled, keep-alive connection set shared by every request
+DYNAMODB_CONFIG = Config(
+    max_pool_connections=64,
+    tcp_keepalive=True,
+    connect_timeout=1,
+    read_timeout=2,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+
 try:
     # Use local DynamoDB for development if AWS credentials not available
     if os.environ.get('AWS_ACCESS_KEY_ID'):
-        dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION_NAME)
+        dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION_NAME, config=DYNAMODB_CONFIG)
         sns = boto3.client('sns', region_name=AWS_REGION_NAME) if ENABLE_SNS else None
     else:
         # Mock DynamoDB for local development
@@ -72,39 +158,247 @@ except Exception as e:
     dynamodb = None
     sns = None
 
+try:
+    if dynamodb and DAX_ENDPOINT:
+        from amazondax import AmazonDaxClient
+        dax = AmazonDaxClient.resource(endpoint_url=DAX_ENDPOINT, region_name=AWS_REGION_NAME)
+    else:
+        dax = None
+        
+except Exception as e:
+    logger.error(f"Error initializing DAX client: {e}")
+    dax = None
+
+try:
+    if REDIS_URL:
+        from redis import Redis
+        redis_client = Redis.from_url(REDIS_URL)
+    else:
+        redis_client = None
+        logger.warning("REDIS_URL not set. Login rate limiting is per-process.")
+        
+except Exception as e:
+    logger.error(f"Error initializing Redis: {e}")
+    redis_client = None
+
 # ---------------------------------------
 # Mock Database for Local Development
 # ---------------------------------------
-# Simple in-memory storage for local development
+# Simple in-memory storage for local development. Activities and health metrics
+# are kept per user in timestamp order, so reads are slices rather than sorts.
+def new_timeline():
+    return SortedKeyList(key=itemgetter('timestamp'))
+
 local_db = {
     'users': {},
-    'activities': {},
-    'health_metrics': {},
-    'goals': {}
+    'activities': defaultdict(new_timeline),
+    'health_metrics': defaultdict(new_timeline),
+    'goals': defaultdict(list)
 }
 
 # ---------------------------------------
 # Database Helper Functions
 # ---------------------------------------
-def get_user_table():
+def uuid7():
+    """Time-ordered UUIDv7 so new items land next to each other instead of at random keys"""
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), 'big')
+    value = value & ~(0xF << 76) | 0x7 << 76  # version 7
+    value = value & ~(0x3 << 62) | 0x2 << 62  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
+# Table handles are built once at import and referenced directly by every request
+user_table = dynamodb.Table(USERS_TABLE_NAME) if dynamodb else None
+activities_table = dynamodb.Table(ACTIVITIES_TABLE_NAME) if dynamodb else None
+health_metrics_table = dynamodb.Table(HEALTH_METRICS_TABLE_NAME) if dynamodb else None
+goals_table = dynamodb.Table(GOALS_TABLE_NAME) if dynamodb else None
+
+# List reads go through DAX when configured. Writes go straight to DynamoDB, so
+# cached query results can trail a write by up to the cluster's query TTL.
+activities_read_table = dax.Table(ACTIVITIES_TABLE_NAME) if dax else activities_table
+health_metrics_read_table = dax.Table(HEALTH_METRICS_TABLE_NAME) if dax else health_metrics_table
+goals_read_table = dax.Table(GOALS_TABLE_NAME) if dax else goals_table
+
+def query_user_items(table, index_name, key_condition, limit=None, filter_expression=None):
+    """Query a user_id GSI newest-first, following pages until `limit` items are collected"""
+    query_kwargs = {
+        'IndexName': index_name,
+        'KeyConditionExpression': key_condition,
+        'ScanIndexForward': False
+    }
+    if filter_expression is not None:
+        query_kwargs['FilterExpression'] = filter_expression
+    
+    items = []
+    while True:
+        if limit is not None:
+            query_kwargs['Limit'] = limit - len(items)
+        response = table.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response or (limit is not None and len(items) >= limit):
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    return items[:limit] if limit is not None else items
+
+def fetch_user_activities(user_id, limit=None):
+    if dynamodb:
+        return query_user_items(activities_read_table, USER_TIMESTAMP_INDEX, Key('user_id').eq(user_id), limit=limit)
+    return list(islice(reversed(local_db['activities'][user_id]), limit))
+
+def build_activity(activity, user_id, now):
+    """Build an activity item from a decoded ActivityIn, or return None if required fields are empty"""
+    if not activity.activity_type or not activity.duration:
+        return None
+    
+    return {
+        'activity_id': uuid7(),
+        'user_id': user_id,
+        'activity_type': activity.activity_type,
+        'duration': activity.duration,
+        'calories_burned': activity.calories_burned or 0,
+        'notes': activity.notes,
+        'date': now.strftime('%Y-%m-%d'),
+        'timestamp': now.isoformat()
+    }
+
+def build_health_metric(metric, user_id, now):
+    """Build a health metric item from a decoded HealthMetricIn, or return None if required fields are empty"""
+    if not metric.metric_type:
+        return None
+    
+    return {
+        'metric_id': uuid7(),
+        'user_id': user_id,
+        'metric_type': metric.metric_type,
+        'value': metric.value,
+        'unit': metric.unit,
+        'notes': metric.notes,
+        'date': now.strftime('%Y-%m-%d'),
+        'timestamp': now.isoformat()
+    }
+
+def increment_user_activity_stats(email, calories_burned, count=1):
+    """Atomically bump the running activity totals kept on the user row"""
+    if dynamodb:
+        user_table.update_item(
+            Key={'email': email},
+            UpdateExpression='ADD total_activities :n, total_calories_burned :c',
+            ExpressionAttributeValues={':n': count, ':c': calories_burned}
+        )
+        return
+    user = local_db['users'].get(email)
+    if user is not None:
+        user['total_activities'] = user.get('total_activities', 0) + count
+        user['total_calories_burned'] = user.get('total_calories_burned', 0) + calories_burned
+
+@lru_cache(maxsize=10000)
+def fetch_user_info(user_id):
+    """Return (email, name) for a user_id; the session stores only the id"""
+    if dynamodb:
+        response = user_table.query(
+            IndexName=USER_ID_INDEX,
+            KeyConditionExpression=Key('user_id').eq(user_id),
+            Limit=1
+        )
+        user = response['Items'][0] if response['Items'] else None
+    else:
+        user = next((u for u in local_db['users'].values() if u['user_id'] == user_id), None)
+    
+    if user is None:
+        # Raising keeps the miss out of the cache
+        raise LookupError(f"No user with id {user_id}")
+    return user['email'], user['name']
+
+def fetch_user_activity_stats(email):
     if dynamodb:
-        return dynamodb.Table(USERS_TABLE_NAME)
-    return None
+        response = user_table.get_item(
+            Key={'email': email},
+            ProjectionExpression='total_activities, total_calories_burned'
+        )
+        user = response.get('Item', {})
+    else:
+        user = local_db['users'].get(email, {})
+    return int(user.get('total_activities', 0)), int(user.get('total_calories_burned', 0))
 
-def get_activities_table():
+def backfill_user_activity_stats():
+    """One-shot migration: compute the activity totals for users created before they were maintained"""
+    users_by_id = {}
+    for page in dynamodb.meta.client.get_paginator('scan').paginate(
+        TableName=USERS_TABLE_NAME, ProjectionExpression='email, user_id'
+    ):
+        for item in page['Items']:
+            users_by_id[item['user_id']['S']] = item['email']['S']
+    
+    totals = {}
+    for page in dynamodb.meta.client.get_paginator('scan').paginate(
+        TableName=ACTIVITIES_TABLE_NAME, ProjectionExpression='user_id, calories_burned'
+    ):
+        for item in page['Items']:
+            count, calories = totals.get(item['user_id']['S'], (0, 0))
+            totals[item['user_id']['S']] = (count + 1, calories + int(item.get('calories_burned', {}).get('N', 0)))
+    
+    for user_id, email in users_by_id.items():
+        count, calories = totals.get(user_id, (0, 0))
+        user_table.update_item(
+            Key={'email': email},
+            UpdateExpression='SET total_activities = :n, total_calories_burned = :c',
+            ExpressionAttributeValues={':n': count, ':c': calories}
+        )
+    logger.info(f"Backfilled activity stats for {len(users_by_id)} users")
+
+def count_user_activities_since(user_id, since_iso):
+    """Count a user's activities with timestamp >= since_iso without transferring the items"""
     if dynamodb:
-        return dynamodb.Table(ACTIVITIES_TABLE_NAME)
-    return None
+        query_kwargs = {
+            'IndexName': USER_TIMESTAMP_INDEX,
+            'KeyConditionExpression': Key('user_id').eq(user_id) & Key('timestamp').gte(since_iso),
+            'Select': 'COUNT'
+        }
+        count = 0
+        while True:
+            response = activities_read_table.query(**query_kwargs)
+            count += response['Count']
+            if 'LastEvaluatedKey' not in response:
+                return count
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    # ISO timestamps sort lexically, so the count is a bisect on the timeline
+    user_activities = local_db['activities'][user_id]
+    return len(user_activities) - user_activities.bisect_key_left(since_iso)
 
-def get_health_metrics_table():
+def fetch_user_health_metrics(user_id, limit=None):
     if dynamodb:
-        return dynamodb.Table(HEALTH_METRICS_TABLE_NAME)
-    return None
+        return query_user_items(health_metrics_read_table, USER_TIMESTAMP_INDEX, Key('user_id').eq(user_id), limit=limit)
+    return list(islice(reversed(local_db['health_metrics'][user_id]), limit))
 
-def get_goals_table():
+def fetch_user_active_goals(user_id):
     if dynamodb:
-        return dynamodb.Table(GOALS_TABLE_NAME)
-    return None
+        return query_user_items(goals_read_table, USER_STATUS_INDEX, Key('user_id').eq(user_id) & Key('status').eq('active'))
+    return [g for g in local_db['goals'][user_id] if g.get('status') == 'active']
+
+def warm_table_connection(table_name):
+    try:
+        dynamodb.meta.client.describe_table(TableName=table_name)
+    except Exception as e:
+        logger.warning(f"Could not warm connection for {table_name}: {e}")
+
+def warm_connections():
+    """Establish TCP/TLS sessions to DynamoDB for every table in parallel before traffic arrives"""
+    table_names = [USERS_TABLE_NAME, ACTIVITIES_TABLE_NAME, HEALTH_METRICS_TABLE_NAME, GOALS_TABLE_NAME]
+    list(dashboard_pool.map(warm_table_connection, table_names))
+    logger.info("DynamoDB connections warmed")
+
+def future_result_or_default(future, default, description, deadline):
+    """Wait for a dashboard fetch until the shared monotonic deadline, falling back to `default` so one failed branch doesn't fail the page"""
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except Exception as e:
+        # Drop it from the pool queue if it never started
+        future.cancel()
+        logger.warning(f"Dashboard falling back to default {description}: {e!r}")
+        return default
+
+if dynamodb and WARMUP_CONNECTIONS:
+    warm_connections()
 
 # ---------------------------------------
 # Authentication Decorator
@@ -117,9 +411,70 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def etag_on_user_data(f):
+    """Answer GETs with 304 when the client already holds the body this request would return"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        response = make_response(f(*args, **kwargs))
+        if response.status_code != 200:
+            return response
+        
+        # Tag the body actually returned: reads may come from DAX and trail writes,
+        # and the dashboard's weekly count changes with the clock, not with a write
+        response.set_etag(hashlib.blake2b(response.get_data(), digest_size=8).hexdigest())
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+    return decorated_function
+
 # ---------------------------------------
 # Utility Functions
 # ---------------------------------------
+# Each thread keeps one authenticated SMTP session and reuses it across emails
+smtp_local = threading.local()
+smtp_connections = set()
+smtp_connections_lock = threading.Lock()
+
+def get_smtp_connection():
+    server = getattr(smtp_local, 'server', None)
+    if server is not None:
+        try:
+            if server.noop()[0] == 250:
+                return server
+        except (smtplib.SMTPException, OSError):
+            pass
+        reset_smtp_connection()
+    
+    server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+    server.starttls()
+    server.login(SENDER_EMAIL, SENDER_PASSWORD)
+    smtp_local.server = server
+    with smtp_connections_lock:
+        smtp_connections.add(server)
+    return server
+
+def reset_smtp_connection():
+    server = getattr(smtp_local, 'server', None)
+    smtp_local.server = None
+    if server is None:
+        return
+    with smtp_connections_lock:
+        smtp_connections.discard(server)
+    try:
+        server.close()
+    except Exception:
+        pass
+
+@atexit.register
+def close_smtp_connections():
+    with smtp_connections_lock:
+        servers = list(smtp_connections)
+        smtp_connections.clear()
+    for server in servers:
+        try:
+            server.quit()
+        except Exception:
+            pass
+
 def send_email_notification(to_email, subject, body):
     if not ENABLE_EMAIL or not SENDER_EMAIL:
         logger.info(f"Email notification would be sent: {subject}")
@@ -132,11 +487,12 @@ def send_email_notification(to_email, subject, body):
         msg['Subject'] = subject
         msg.attach(MIMEText(body, 'plain'))
         
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        server.send_message(msg)
-        server.quit()
+        try:
+            get_smtp_connection().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped our idle session; reconnect and retry once
+            reset_smtp_connection()
+            get_smtp_connection().send_message(msg)
         
         logger.info(f"Email sent successfully to {to_email}")
         return True
@@ -144,6 +500,23 @@ def send_email_notification(to_email, subject, body):
         logger.error(f"Failed to send email: {e}")
         return False
 
+# Emails are sent by a background worker so request handlers never wait on SMTP
+email_queue = queue.Queue()
+
+def email_worker():
+    while True:
+        to_email, subject, body = email_queue.get()
+        try:
+            send_email_notification(to_email, subject, body)
+        finally:
+            email_queue.task_done()
+
+email_thread = threading.Thread(target=email_worker, name='email-worker', daemon=True)
+email_thread.start()
+
+def queue_email_notification(to_email, subject, body):
+    email_queue.put((to_email, subject, body))
+
 def send_sns_notification(message):
     if not ENABLE_SNS or not sns or not SNS_TOPIC_ARN:
         logger.info(f"SNS notification would be sent: {message}")
@@ -157,23 +530,161 @@ def send_sns_notification(message):
         logger.error(f"Failed to send SNS notification: {e}")
         return False
 
+# ---------------------------------------
+# Password Hashing
+# ---------------------------------------
+def run_cpu_bound(func, *args):
+    if GEVENT_PATCHED:
+        return get_hub().threadpool.apply(func, args)
+    return cpu_pool.submit(func, *args).result()
+
+def hash_password(password):
+    return run_cpu_bound(password_hasher.hash, password)
+
+def verify_password_hash(password_hash, password):
+    """Return (matches, needs_rehash) for an argon2 or legacy Werkzeug PBKDF2 hash"""
+    if not password_hash.startswith('$argon2'):
+        # Hashes created before the argon2 migration
+        return check_password_hash(password_hash, password), True
+    try:
+        password_hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False, False
+    return True, password_hasher.check_needs_rehash(password_hash)
+
+def verify_password(password_hash, password):
+    # Reject empty or unrecognised hashes before queueing any CPU work
+    if not password_hash or not password_hash.startswith(PASSWORD_HASH_PREFIXES):
+        return False, False
+    return run_cpu_bound(verify_password_hash, password_hash, password)
+
+def update_password_hash(user_data, password):
+    """Re-hash a password with the current argon2 parameters after a successful login"""
+    try:
+        new_hash = hash_password(password)
+        if dynamodb:
+            user_table.update_item(
+                Key={'email': user_data['email']},
+                UpdateExpression='SET password_hash = :h',
+                ExpressionAttributeValues={':h': new_hash}
+            )
+        user_data['password_hash'] = new_hash
+    except Exception as e:
+        logger.error(f"Error upgrading password hash: {e}")
+
+# ---------------------------------------
+# Rate Limiting
+# ---------------------------------------
+# Local fallback for the Redis counters: key -> attempts in the current window
+login_attempts = {}
+login_attempts_window = None
+login_attempts_lock = threading.Lock()
+
+def login_rate_limit_keys(client_ip, email):
+    window = int(time.time() // LOGIN_WINDOW_SECONDS)
+    email_hash = hashlib.sha256(email.lower().encode()).hexdigest()
+    return window, f'rl:login:ip:{client_ip}:{window}', f'rl:login:id:{email_hash}:{window}'
+
+def login_rate_limited(client_ip, email):
+    """Count this attempt in the current window and report whether the IP or email is over quota"""
+    global login_attempts_window
+    window, ip_key, email_key = login_rate_limit_keys(client_ip, email)
+    
+    if redis_client:
+        pipe = redis_client.pipeline()
+        for key in (ip_key, email_key):
+            pipe.incr(key)
+            pipe.expire(key, LOGIN_WINDOW_SECONDS)
+        ip_count, _, email_count, _ = pipe.execute()
+    else:
+        with login_attempts_lock:
+            # Counters from earlier windows can never matter again
+            if login_attempts_window != window:
+                login_attempts.clear()
+                login_attempts_window = window
+            ip_count = login_attempts[ip_key] = login_attempts.get(ip_key, 0) + 1
+            email_count = login_attempts[email_key] = login_attempts.get(email_key, 0) + 1
+    
+    return ip_count > MAX_LOGIN_ATTEMPTS_PER_IP or email_count > MAX_LOGIN_ATTEMPTS_PER_EMAIL
+
+def clear_login_attempts(client_ip, email):
+    # Only the account quota resets; the per-IP quota still bounds guessing across accounts
+    _, _, email_key = login_rate_limit_keys(client_ip, email)
+    if redis_client:
+        redis_client.delete(email_key)
+        return
+    with login_attempts_lock:
+        login_attempts.pop(email_key, None)
+
+# ---------------------------------------
+# Request Schemas
+# ---------------------------------------
+# Request bodies are parsed, type-checked and coerced in one pass by msgspec
+class RegisterIn(msgspec.Struct):
+    email: str
+    password: str
+    name: str
+
+class LoginIn(msgspec.Struct):
+    email: str
+    password: str
+
+class ActivityIn(msgspec.Struct):
+    activity_type: str  # e.g., 'running', 'cycling', 'gym'
+    duration: int  # in minutes
+    calories_burned: Optional[int] = None
+    notes: Optional[str] = ''
+
+class ActivitiesBulkIn(msgspec.Struct):
+    activities: list[ActivityIn]
+
+class HealthMetricIn(msgspec.Struct):
+    metric_type: str  # e.g., 'weight', 'blood_pressure', 'heart_rate'
+    value: float
+    unit: Optional[str] = ''
+    notes: Optional[str] = ''
+
+class HealthMetricsBulkIn(msgspec.Struct):
+    health_metrics: list[HealthMetricIn]
+
+class GoalIn(msgspec.Struct):
+    goal_type: str  # e.g., 'weight_loss', 'exercise_frequency'
+    target_value: float
+    current_value: float = 0.0
+    target_date: Optional[str] = None
+    description: Optional[str] = ''
+
+def decode_request(schema):
+    # strict=False keeps accepting numbers sent as strings, e.g. "duration": "30"
+    return msgspec.json.decode(request.get_data(), type=schema, strict=False)
+
+def parse_limit(default=10):
+    """Return the ?limit= query parameter as a positive int, or None if it isn't one"""
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        return None
+    return limit if limit > 0 else None
+
 # ---------------------------------------
 # Authentication Routes
 # ---------------------------------------
 @app.route('/api/register', methods=['POST'])
 def register():
     try:
-        data = request.get_json()
-        email = data.get('email')
-        password = data.get('password')
-        name = data.get('name')
+        try:
+            data = decode_request(RegisterIn)
+        except msgspec.DecodeError as e:
+            return jsonify({'error': str(e)}), 400
+        email = data.email
+        password = data.password
+        name = data.name
         
         if not email or not password or not name:
             return jsonify({'error': 'Email, password, and name are required'}), 400
         
         # Check if user already exists
         if dynamodb:
-            user_table = get_user_table()
             try:
                 response = user_table.get_item(Key={'email': email})
                 if 'Item' in response:
@@ -186,8 +697,8 @@ def register():
                 return jsonify({'error': 'User already exists'}), 400
         
         # Create new user
-        user_id = str(uuid.uuid4())
-        hashed_password = generate_password_hash(password)
+        user_id = uuid7()
+        hashed_password = hash_password(password)
         
         user_data = {
             'user_id': user_id,
@@ -199,7 +710,6 @@ def register():
         }
         
         if dynamodb:
-            user_table = get_user_table()
             user_table.put_item(Item=user_data)
         else:
             local_db['users'][email] = user_data
@@ -207,7 +717,7 @@ def register():
         # Send welcome email
         welcome_subject = "Welcome to WellnessTracker!"
         welcome_body = f"Hi {name},\n\nWelcome to WellnessTracker! Start tracking your wellness journey today.\n\nBest regards,\nWellnessTracker Team"
-        send_email_notification(email, welcome_subject, welcome_body)
+        queue_email_notification(email, welcome_subject, welcome_body)
         
         logger.info(f"New user registered: {email}")
         return jsonify({'message': 'User registered successfully', 'user_id': user_id}), 201
@@ -219,27 +729,24 @@ def register():
 @app.route('/api/login', methods=['POST'])
 def login():
     try:
-        data = request.get_json()
-        email = data.get('email')
-        password = data.get('password')
+        try:
+            data = decode_request(LoginIn)
+        except msgspec.DecodeError as e:
+            return jsonify({'error': str(e)}), 400
+        email = data.email
+        password = data.password
         
         if not email or not password:
             return jsonify({'error': 'Email and password are required'}), 400
         
         # Rate limiting check
         client_ip = request.remote_addr
-        if client_ip in login_attempts:
-            if login_attempts[client_ip]['count'] >= 5:
-                time_diff = datetime.now() - login_attempts[client_ip]['last_attempt']
-                if time_diff < timedelta(minutes=15):
-                    return jsonify({'error': 'Too many login attempts. Try again later.'}), 429
-                else:
-                    login_attempts[client_ip] = {'count': 0, 'last_attempt': datetime.now()}
+        if login_rate_limited(client_ip, email):
+            return jsonify({'error': 'Too many login attempts. Try again later.'}), 429
         
         # Get user
         user_data = None
         if dynamodb:
-            user_table = get_user_table()
             try:
                 response = user_table.get_item(Key={'email': email})
                 if 'Item' in response:
@@ -250,32 +757,21 @@ def login():
             user_data = local_db['users'].get(email)
         
         if not user_data:
-            # Track failed attempt
-            if client_ip not in login_attempts:
-                login_attempts[client_ip] = {'count': 0, 'last_attempt': datetime.now()}
-            login_attempts[client_ip]['count'] += 1
-            login_attempts[client_ip]['last_attempt'] = datetime.now()
-            
             return jsonify({'error': 'Invalid credentials'}), 401
         
         # Verify password
-        if not check_password_hash(user_data['password_hash'], password):
-            # Track failed attempt
-            if client_ip not in login_attempts:
-                login_attempts[client_ip] = {'count': 0, 'last_attempt': datetime.now()}
-            login_attempts[client_ip]['count'] += 1
-            login_attempts[client_ip]['last_attempt'] = datetime.now()
-            
+        password_matches, needs_rehash = verify_password(user_data['password_hash'], password)
+        if not password_matches:
             return jsonify({'error': 'Invalid credentials'}), 401
         
+        if needs_rehash:
+            update_password_hash(user_data, password)
+        
         # Reset login attempts on successful login
-        if client_ip in login_attempts:
-            del login_attempts[client_ip]
+        clear_login_attempts(client_ip, email)
         
         # Create session
         session['user_id'] = user_data['user_id']
-        session['email'] = user_data['email']
-        session['name'] = user_data['name']
         session.permanent = True
         
         logger.info(f"User logged in: {email}")
@@ -305,34 +801,25 @@ def logout():
 @login_required
 def log_activity():
     try:
-        data = request.get_json()
-        activity_type = data.get('activity_type')  # e.g., 'running', 'cycling', 'gym'
-        duration = data.get('duration')  # in minutes
-        calories_burned = data.get('calories_burned')
-        notes = data.get('notes', '')
+        try:
+            data = decode_request(ActivityIn)
+        except msgspec.DecodeError as e:
+            return jsonify({'error': str(e)}), 400
+        activity_data = build_activity(data, session['user_id'], datetime.now())
         
-        if not activity_type or not duration:
+        if not activity_data:
             return jsonify({'error': 'Activity type and duration are required'}), 400
         
-        activity_id = str(uuid.uuid4())
-        activity_data = {
-            'activity_id': activity_id,
-            'user_id': session['user_id'],
-            'activity_type': activity_type,
-            'duration': int(duration),
-            'calories_burned': int(calories_burned) if calories_burned else 0,
-            'notes': notes,
-            'date': datetime.now().strftime('%Y-%m-%d'),
-            'timestamp': datetime.now().isoformat()
-        }
+        activity_id = activity_data['activity_id']
+        activity_type = activity_data['activity_type']
         
         if dynamodb:
-            activities_table = get_activities_table()
             activities_table.put_item(Item=activity_data)
         else:
-            if session['user_id'] not in local_db['activities']:
-                local_db['activities'][session['user_id']] = []
-            local_db['activities'][session['user_id']].append(activity_data)
+            local_db['activities'][session['user_id']].add(activity_data)
+        
+        email, _ = fetch_user_info(session['user_id'])
+        increment_user_activity_stats(email, activity_data['calories_burned'])
         
         logger.info(f"Activity logged: {activity_type} for user {session['user_id']}")
         return jsonify({'message': 'Activity logged successfully', 'activity_id': activity_id}), 201
@@ -341,34 +828,77 @@ def log_activity():
         logger.error(f"Error logging activity: {e}")
         return jsonify({'error': 'Failed to log activity'}), 500
 
+@app.route('/api/activities/bulk', methods=['POST'])
+@login_required
+def log_activities_bulk():
+    try:
+        try:
+            items = decode_request(ActivitiesBulkIn).activities
+        except msgspec.DecodeError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not items:
+            return jsonify({'error': 'A non-empty activities list is required'}), 400
+        if len(items) > MAX_BULK_ITEMS:
+            return jsonify({'error': f'At most {MAX_BULK_ITEMS} activities per request'}), 400
+        
+        now = datetime.now()
+        activities = []
+        for index, item in enumerate(items):
+            activity_data = build_activity(item, session['user_id'], now)
+            if not activity_data:
+                return jsonify({'error': f'Activity {index}: activity type and duration are required'}), 400
+            activities.append(activity_data)
+        
+        if dynamodb:
+            # batch_writer sends BatchWriteItem requests of 25 and retries unprocessed items
+            with activities_table.batch_writer(overwrite_by_pkeys=['activity_id']) as batch:
+                for activity_data in activities:
+                    batch.put_item(Item=activity_data)
+        else:
+            local_db['activities'][session['user_id']].update(activities)
+        
+        email, _ = fetch_user_info(session['user_id'])
+        increment_user_activity_stats(
+            email,
+            sum(a['calories_burned'] for a in activities),
+            count=len(activities)
+        )
+        
+        logger.info(f"{len(activities)} activities logged for user {session['user_id']}")
+        return jsonify({
+            'message': 'Activities logged successfully',
+            'activity_ids': [a['activity_id'] for a in activities]
+        }), 201
+        
+    except Exception as e:
+        logger.error(f"Error logging activities: {e}")
+        return jsonify({'error': 'Failed to log activities'}), 500
+
 @app.route('/api/activities', methods=['GET'])
 @login_required
+@etag_on_user_data
 def get_activities():
     try:
         # Get query parameters
-        limit = int(request.args.get('limit', 10))
+        limit = parse_limit()
+        if limit is None:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
         date_from = request.args.get('date_from')
         
         activities = []
         
         if dynamodb:
-            # In a real implementation, you'd query by user_id with GSI
-            # For now, using scan with filter (not recommended for production)
-            activities_table = get_activities_table()
-            response = activities_table.scan()
-            user_activities = [item for item in response['Items'] if item['user_id'] == session['user_id']]
+            # Query the user's GSI; DynamoDB returns the rows newest first, bounded by limit
+            key_condition = Key('user_id').eq(session['user_id'])
+            if date_from:
+                # ISO timestamps sort lexically, so the date filter becomes a range key condition
+                key_condition = key_condition & Key('timestamp').gte(date_from)
+            activities = query_user_items(activities_read_table, USER_TIMESTAMP_INDEX, key_condition, limit=limit)
         else:
-            user_activities = local_db['activities'].get(session['user_id'], [])
-        
-        # Sort by timestamp (newest first)
-        user_activities.sort(key=lambda x: x['timestamp'], reverse=True)
-        
-        # Apply filters
-        if date_from:
-            user_activities = [a for a in user_activities if a['date'] >= date_from]
-        
-        # Apply limit
-        activities = user_activities[:limit]
+            # Newest first, stopping at date_from, bounded by limit
+            user_activities = local_db['activities'][session['user_id']]
+            activities = list(islice(user_activities.irange_key(min_key=date_from, reverse=True), limit))
         
         return jsonify({'activities': activities}), 200
         
@@ -383,34 +913,22 @@ def get_activities():
 @login_required
 def log_health_metric():
     try:
-        data = request.get_json()
-        metric_type = data.get('metric_type')  # e.g., 'weight', 'blood_pressure', 'heart_rate'
-        value = data.get('value')
-        unit = data.get('unit', '')
-        notes = data.get('notes', '')
+        try:
+            data = decode_request(HealthMetricIn)
+        except msgspec.DecodeError as e:
+            return jsonify({'error': str(e)}), 400
+        metric_data = build_health_metric(data, session['user_id'], datetime.now())
         
-        if not metric_type or value is None:
+        if not metric_data:
             return jsonify({'error': 'Metric type and value are required'}), 400
         
-        metric_id = str(uuid.uuid4())
-        metric_data = {
-            'metric_id': metric_id,
-            'user_id': session['user_id'],
-            'metric_type': metric_type,
-            'value': float(value),
-            'unit': unit,
-            'notes': notes,
-            'date': datetime.now().strftime('%Y-%m-%d'),
-            'timestamp': datetime.now().isoformat()
-        }
+        metric_id = metric_data['metric_id']
+        metric_type = metric_data['metric_type']
         
         if dynamodb:
-            health_metrics_table = get_health_metrics_table()
             health_metrics_table.put_item(Item=metric_data)
         else:
-            if session['user_id'] not in local_db['health_metrics']:
-                local_db['health_metrics'][session['user_id']] = []
-            local_db['health_metrics'][session['user_id']].append(metric_data)
+            local_db['health_metrics'][session['user_id']].add(metric_data)
         
         logger.info(f"Health metric logged: {metric_type} for user {session['user_id']}")
         return jsonify({'message': 'Health metric logged successfully', 'metric_id': metric_id}), 201
@@ -419,29 +937,72 @@ def log_health_metric():
         logger.error(f"Error logging health metric: {e}")
         return jsonify({'error': 'Failed to log health metric'}), 500
 
-@app.route('/api/health-metrics', methods=['GET'])
+@app.route('/api/health-metrics/bulk', methods=['POST'])
 @login_required
-def get_health_metrics():
+def log_health_metrics_bulk():
     try:
-        metric_type = request.args.get('metric_type')
-        limit = int(request.args.get('limit', 10))
+        try:
+            items = decode_request(HealthMetricsBulkIn).health_metrics
+        except msgspec.DecodeError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not items:
+            return jsonify({'error': 'A non-empty health_metrics list is required'}), 400
+        if len(items) > MAX_BULK_ITEMS:
+            return jsonify({'error': f'At most {MAX_BULK_ITEMS} health metrics per request'}), 400
+        
+        now = datetime.now()
+        metrics = []
+        for index, item in enumerate(items):
+            metric_data = build_health_metric(item, session['user_id'], now)
+            if not metric_data:
+                return jsonify({'error': f'Health metric {index}: metric type and value are required'}), 400
+            metrics.append(metric_data)
         
         if dynamodb:
-            health_metrics_table = get_health_metrics_table()
-            response = health_metrics_table.scan()
-            user_metrics = [item for item in response['Items'] if item['user_id'] == session['user_id']]
+            with health_metrics_table.batch_writer(overwrite_by_pkeys=['metric_id']) as batch:
+                for metric_data in metrics:
+                    batch.put_item(Item=metric_data)
         else:
-            user_metrics = local_db['health_metrics'].get(session['user_id'], [])
+            local_db['health_metrics'][session['user_id']].update(metrics)
         
-        # Filter by metric type if specified
-        if metric_type:
-            user_metrics = [m for m in user_metrics if m['metric_type'] == metric_type]
+        logger.info(f"{len(metrics)} health metrics logged for user {session['user_id']}")
+        return jsonify({
+            'message': 'Health metrics logged successfully',
+            'metric_ids': [m['metric_id'] for m in metrics]
+        }), 201
         
-        # Sort by timestamp (newest first)
-        user_metrics.sort(key=lambda x: x['timestamp'], reverse=True)
+    except Exception as e:
+        logger.error(f"Error logging health metrics: {e}")
+        return jsonify({'error': 'Failed to log health metrics'}), 500
+
+@app.route('/api/health-metrics', methods=['GET'])
+@login_required
+@etag_on_user_data
+def get_health_metrics():
+    try:
+        metric_type = request.args.get('metric_type')
+        limit = parse_limit()
+        if limit is None:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
         
-        # Apply limit
-        metrics = user_metrics[:limit]
+        if dynamodb:
+            metrics = query_user_items(
+                health_metrics_read_table,
+                USER_TIMESTAMP_INDEX,
+                Key('user_id').eq(session['user_id']),
+                limit=limit,
+                filter_expression=Attr('metric_type').eq(metric_type) if metric_type else None
+            )
+        else:
+            user_metrics = reversed(local_db['health_metrics'][session['user_id']])
+            
+            # Filter by metric type if specified
+            if metric_type:
+                user_metrics = (m for m in user_metrics if m['metric_type'] == metric_type)
+            
+            # Apply limit
+            metrics = list(islice(user_metrics, limit))
         
         return jsonify({'health_metrics': metrics}), 200
         
@@ -456,35 +1017,31 @@ def get_health_metrics():
 @login_required
 def create_goal():
     try:
-        data = request.get_json()
-        goal_type = data.get('goal_type')  # e.g., 'weight_loss', 'exercise_frequency'
-        target_value = data.get('target_value')
-        current_value = data.get('current_value', 0)
-        target_date = data.get('target_date')
-        description = data.get('description', '')
-        
-        if not goal_type or target_value is None:
+        try:
+            data = decode_request(GoalIn)
+        except msgspec.DecodeError as e:
+            return jsonify({'error': str(e)}), 400
+        goal_type = data.goal_type
+        
+        if not goal_type:
             return jsonify({'error': 'Goal type and target value are required'}), 400
         
-        goal_id = str(uuid.uuid4())
+        goal_id = uuid7()
         goal_data = {
             'goal_id': goal_id,
             'user_id': session['user_id'],
             'goal_type': goal_type,
-            'target_value': float(target_value),
-            'current_value': float(current_value),
-            'target_date': target_date,
-            'description': description,
+            'target_value': data.target_value,
+            'current_value': data.current_value,
+            'target_date': data.target_date,
+            'description': data.description,
             'status': 'active',
             'created_at': datetime.now().isoformat()
         }
         
         if dynamodb:
-            goals_table = get_goals_table()
             goals_table.put_item(Item=goal_data)
         else:
-            if session['user_id'] not in local_db['goals']:
-                local_db['goals'][session['user_id']] = []
             local_db['goals'][session['user_id']].append(goal_data)
         
         logger.info(f"Goal created: {goal_type} for user {session['user_id']}")
@@ -496,17 +1053,20 @@ def create_goal():
 
 @app.route('/api/goals', methods=['GET'])
 @login_required
+@etag_on_user_data
 def get_goals():
     try:
         if dynamodb:
-            goals_table = get_goals_table()
-            response = goals_table.scan()
-            user_goals = [item for item in response['Items'] if item['user_id'] == session['user_id']]
+            active_goals = query_user_items(
+                goals_read_table,
+                USER_STATUS_INDEX,
+                Key('user_id').eq(session['user_id']) & Key('status').eq('active')
+            )
         else:
-            user_goals = local_db['goals'].get(session['user_id'], [])
-        
-        # Filter active goals
-        active_goals = [g for g in user_goals if g.get('status') == 'active']
+            user_goals = local_db['goals'][session['user_id']]
+            
+            # Filter active goals
+            active_goals = [g for g in user_goals if g.get('status') == 'active']
         
         return jsonify({'goals': active_goals}), 200
         
@@ -519,64 +1079,38 @@ def get_goals():
 # ---------------------------------------
 @app.route('/api/dashboard', methods=['GET'])
 @login_required
+@etag_on_user_data
 def get_dashboard():
     try:
-        # Get recent activities
-        recent_activities = []
-        if dynamodb:
-            activities_table = get_activities_table()
-            response = activities_table.scan()
-            user_activities = [item for item in response['Items'] if item['user_id'] == session['user_id']]
-        else:
-            user_activities = local_db['activities'].get(session['user_id'], [])
-        
-        user_activities.sort(key=lambda x: x['timestamp'], reverse=True)
-        recent_activities = user_activities[:5]
-        
-        # Get recent health metrics
-        recent_metrics = []
-        if dynamodb:
-            health_metrics_table = get_health_metrics_table()
-            response = health_metrics_table.scan()
-            user_metrics = [item for item in response['Items'] if item['user_id'] == session['user_id']]
-        else:
-            user_metrics = local_db['health_metrics'].get(session['user_id'], [])
-        
-        user_metrics.sort(key=lambda x: x['timestamp'], reverse=True)
-        recent_metrics = user_metrics[:5]
-        
-        # Get active goals
-        active_goals = []
-        if dynamodb:
-            goals_table = get_goals_table()
-            response = goals_table.scan()
-            user_goals = [item for item in response['Items'] if item['user_id'] == session['user_id']]
-        else:
-            user_goals = local_db['goals'].get(session['user_id'], [])
+        # This week starts at midnight on Monday
+        today = datetime.now()
+        week_start = (today - timedelta(days=today.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
         
-        active_goals = [g for g in user_goals if g.get('status') == 'active']
+        # Fetch activities, health metrics and goals concurrently, all bounded by one timeout
+        deadline = time.monotonic() + DASHBOARD_FETCH_TIMEOUT
+        user_id = session['user_id']
+        email, name = fetch_user_info(user_id)
+        activities_future = dashboard_pool.submit(fetch_user_activities, user_id, 5)
+        stats_future = dashboard_pool.submit(fetch_user_activity_stats, email)
+        week_count_future = dashboard_pool.submit(count_user_activities_since, user_id, week_start.isoformat())
+        metrics_future = dashboard_pool.submit(fetch_user_health_metrics, user_id, 5)
+        goals_future = dashboard_pool.submit(fetch_user_active_goals, user_id)
         
-        # Calculate some basic stats
-        total_activities = len(user_activities)
-        total_calories = sum([a.get('calories_burned', 0) for a in user_activities])
-        
-        # This week's activities
-        today = datetime.now()
-        week_start = today - timedelta(days=today.weekday())
-        this_week_activities = [
-            a for a in user_activities 
-            if datetime.fromisoformat(a['timestamp']).date() >= week_start.date()
-        ]
+        recent_activities = future_result_or_default(activities_future, [], 'activities', deadline)
+        total_activities, total_calories = future_result_or_default(stats_future, (0, 0), 'activity stats', deadline)
+        this_week_activities = future_result_or_default(week_count_future, 0, "this week's activities", deadline)
+        recent_metrics = future_result_or_default(metrics_future, [], 'health metrics', deadline)
+        active_goals = future_result_or_default(goals_future, [], 'goals', deadline)
         
         dashboard_data = {
             'user_info': {
-                'name': session['name'],
-                'email': session['email']
+                'name': name,
+                'email': email
             },
             'stats': {
                 'total_activities': total_activities,
                 'total_calories_burned': total_calories,
-                'this_week_activities': len(this_week_activities),
+                'this_week_activities': this_week_activities,
                 'active_goals': len(active_goals)
             },
             'recent_activities': recent_activities,
@@ -666,6 +1200,17 @@ logging.basicConfig(
     ]
 )
 
+# The built-in server is for local development only. In production serve the
+# app from gevent workers so requests blocked on DynamoDB/SMTP share a few threads:
+#   gunicorn -k gevent -w $(nproc) --worker-connections 1000 <module>:app
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['backfill-stats']:
+        backfill_user_activity_stats()
+        sys.exit(0)
+    
     logger.info("Starting WellnessTracker API server...")
-    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=True)
+    app.run(
+        host='0.0.0.0',
+        port=int(os.environ.get('PORT', 5000)),
+        debug=os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'
+    )